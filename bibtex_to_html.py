@@ -8,6 +8,7 @@
 # Github: https://github.com/pSpitzner/publicationlist_bibtex_to_html
 #
 # pip install pylatexenc bibtexparser
+# optional, for a faster cache: pip install orjson
 #
 # Simple script to generate a html list of publications from an existing
 # bibtex file, or to create one from scatch.
@@ -27,12 +28,59 @@ logging.basicConfig(
 log = logging.getLogger("main script")
 log.setLevel(logging.INFO)
 
+import contextlib
+import functools
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
 import bibtexparser
 from bibtexparser.bparser import BibTexParser
+from bibtexparser.bibdatabase import BibDatabase
 import bibtexparser.customization as btxc
 
 from pylatexenc.latex2text import LatexNodes2Text
 
+# optional, faster reading and writing of the cache. falls back to json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# constructing the converter sets up all macro/environment specs, which is slow.
+# do it once and reuse the instance in `cleanup()`. flags are the defaults, but
+# `cleanup()` relies on them: math as plain text, comments dropped.
+_L2T = LatexNodes2Text(math_mode="text", keep_comments=False)
+
+# anything the latex parser would change: macros, groups, math, comments,
+# special characters, dashes (--) and quotes (`` and '')
+_LATEX_RE = re.compile(r"[\\{}$%&~^_`]|--|''")
+
+# character replacements applied by `cleanup()`, all in one `str.translate` pass
+_CLEANUP_TABLE = str.maketrans(
+    {
+        # I use double quotes for attributes. hence, only use single quotes in text
+        '"': "'",
+        # escape quotes, see https://pagedart.com/blog/single-quote-in-html/
+        # '"': "&#34;",
+        # "'": "&#39;",
+        # "&": "&amp;",
+        # "<": "&lt;",
+        # ">": "&gt;",
+    }
+)
+
+# arxiv ids hidden in urls (`arxiv.org/abs/<id>`) and DOIs (`...arXiv.<id>`)
+_ARXIV_URL_RE = re.compile(r"arxiv\.org/abs/(.*)")
+_ARXIV_DOI_RE = re.compile(r"arXiv\.(.*)")
+
+# 1 MiB buffers for reading the .bib and writing the html, fewer syscalls
+_IO_BUFFER_SIZE = 1 << 20
+
+# start of a bibtex entry, `@type{citekey,` at the beginning of a line
+_BIBTEX_ENTRY_RE = re.compile(r"^[ \t]*@(\w+)\s*[{(]\s*([^,\s]*)", re.MULTILINE)
 
 # ------------------------------------------------------------------------------ #
 # Settings
@@ -61,6 +109,15 @@ use_bootstrap_button_for_abstract = True
 # if settings this to true, the hrefs will also have target="_blank"
 open_badge_links_in_new_tab = True
 
+# parsing bibtex is slow. keep the parsed entries next to the .bib file
+# (as `<bibtex_path>.cache.json`) and only re-parse when the .bib file changed.
+cache_parsed_bibtex = True
+
+# render entries in parallel worker processes when there are at least this many.
+# starting the workers takes a moment, so short lists are faster in serial.
+# set to None to always render in serial.
+parallel_render_min_entries = 50
+
 
 
 # this gets placed before/after the main publist that is created in main()
@@ -86,29 +143,72 @@ page_suffix = """
 """
 
 
-def main():
-    global db, entries
-    with open(bibtex_path) as bibtex_file:
-        parser = BibTexParser(common_strings=True)
-        # do not skip non-standard bibtex fields
-        parser.ignore_nonstandard_types = False
-        db = bibtexparser.load(bibtex_file, parser=parser)
-    log.info(f"Found {len(db.entries)} entries in '{bibtex_path}'")
-
-    # put these into the order in which they should appear online. customize below
-    cite_keys = [
-        "neto_sampling_2022",
-        "yamamoto_modular_2022",
-        "hagemann_intrinsic_2022",
-        "contreras_low_2021",
-        "leite_-synuclein_2022",
-        "contreras_challenges_2021",
-        "spitzner_mr_2021",
-        "dehning_inferring_2020",
-        "spitzner_droplet_2018",
-        "zierenberg_percolation_2017",
-        "fricke_scaling_2017",
-    ]
+# ------------------------------------------------------------------------------ #
+# Publications
+# ------------------------------------------------------------------------------ #
+
+# put these into the order in which they should appear online.
+# entries can be customized in main()
+cite_keys = (
+    "neto_sampling_2022",
+    "yamamoto_modular_2022",
+    "hagemann_intrinsic_2022",
+    "contreras_low_2021",
+    "leite_-synuclein_2022",
+    "contreras_challenges_2021",
+    "spitzner_mr_2021",
+    "dehning_inferring_2020",
+    "spitzner_droplet_2018",
+    "zierenberg_percolation_2017",
+    "fricke_scaling_2017",
+)
+
+# ------------------------------------------------------------------------------ #
+# or build custom entries from scratch, shown under "Other". nested dict.
+# missing fields wont be printed
+# ------------------------------------------------------------------------------ #
+
+other = {
+    "msc_spitzner": {
+        "ID": "msc_spitzner",
+        "author": "Spitzner, Franz Paul",
+        "title": "Two Perspectives on the Condensation-Evaporation Transition of the Lennard-Jones Gas in 2D",
+        "journal": "Master Thesis, Leipzig University",
+        "url": "https://www.physik.uni-leipzig.de/~spitzner/publications/2017-spitzner-two_perspectives_on_the_condensation-evaporation_transition_of_the_lennard-jones_gas_in_2d.pdf",
+    },
+    "hauptseminar": {
+        "ID": "hs_spitzner",
+        "author": "Spitzner, Franz Paul",
+        "title": "Der Münchhausen-Trick — Pulling oneself up by one’s bootstrap",
+        "journal": "Hauptseminar, Leipzig University",
+        "url": "https://www.physik.uni-leipzig.de/~spitzner/publications/Spitzner_bootstrap.pdf",
+    },
+    "bsc_spitzner": {
+        "ID": "bsc_spitzner",
+        "author": "Spitzner, Franz Paul",
+        "title": "Generating Long-range Power-law Correlated Disorder",
+        "journal": "Bachelor Thesis, Leipzig University",
+        "url": "https://www.physik.uni-leipzig.de/~spitzner/publications/Spitzner_CorrelatedDisorder.pdf",
+    },
+}
+
+
+def main(bib_path=None, out_path=None):
+    """
+        Builds the publication list and writes it to a file. Returns nothing.
+
+        bib_path : string, the .bib file to read. defaults to `bibtex_path`
+        out_path : string, the html file to write. defaults to `output_path`
+    """
+    # look up the settings now, not at definition, so changes to them apply
+    if bib_path is None:
+        bib_path = bibtex_path
+    if out_path is None:
+        out_path = output_path
+
+    # only the selected entries get parsed, which is much faster for large libraries
+    db = load_bibtex(bib_path, only_keys=cite_keys)
+    log.info(f"Loaded {len(db.entries)} entries from '{bib_path}'")
 
     log.info(f"Fetching selected {len(cite_keys)} entries")
     entries = get_entry_for_citekey(db, cite_keys)
@@ -145,67 +245,133 @@ def main():
     # entries["neto_unified_2020"]["year"] = "under review"
     # entries["neto_unified_2020"]["journal"] = ""
 
-    # ------------------------------------------------------------------------------ #
-    # or built custom entries from scratch. nested dict.
-    # missing fields wont be printed
-    # ------------------------------------------------------------------------------ #
-
-    other = {
-        "msc_spitzner": {
-            "ID": "msc_spitzner",
-            "author": "Spitzner, Franz Paul",
-            "title": "Two Perspectives on the Condensation-Evaporation Transition of the Lennard-Jones Gas in 2D",
-            "journal": "Master Thesis, Leipzig University",
-            "url": "https://www.physik.uni-leipzig.de/~spitzner/publications/2017-spitzner-two_perspectives_on_the_condensation-evaporation_transition_of_the_lennard-jones_gas_in_2d.pdf",
-        },
-        "hauptseminar": {
-            "ID": "hs_spitzner",
-            "author": "Spitzner, Franz Paul",
-            "title": "Der Münchhausen-Trick — Pulling oneself up by one’s bootstrap",
-            "journal": "Hauptseminar, Leipzig University",
-            "url": "https://www.physik.uni-leipzig.de/~spitzner/publications/Spitzner_bootstrap.pdf",
-        },
-        "bsc_spitzner": {
-            "ID": "bsc_spitzner",
-            "author": "Spitzner, Franz Paul",
-            "title": "Generating Long-range Power-law Correlated Disorder",
-            "journal": "Bachelor Thesis, Leipzig University",
-            "url": "https://www.physik.uni-leipzig.de/~spitzner/publications/Spitzner_CorrelatedDisorder.pdf",
-        },
-    }
+    # we have what we need, drop the rest of the database. this keeps memory
+    # low and avoids dragging it along should the rendering use worker processes
+    del db
 
     # ------------------------------------------------------------------------------ #
-    # build html source code
+    # build html source code and write to file
     # ------------------------------------------------------------------------------ #
     log.info(f"Building html")
 
-    html = ""
-    html += page_prefix
+    # customizations are done, from here on we only need the entries in order
+    selected = [entries[key] for key in cite_keys]
+    split_authors(selected)
+
+    if out_path is not None and len(out_path) > 0:
+        # fragments go straight into a (buffered) temporary file next to the
+        # output, which only replaces `out_path` once everything rendered.
+        # if rendering fails, the previous page stays intact.
+        # resolve symlinks, so we replace the link target and not the link
+        target_path = os.path.realpath(out_path)
+        tmp_path = target_path + ".tmp"
+        # open outside the `try`, errors here leave nothing to clean up
+        text_file = open(tmp_path, "w", buffering=_IO_BUFFER_SIZE)
+        try:
+            with text_file:
+                write_html(text_file.write, selected)
+            if os.path.exists(target_path):
+                # keep permissions of the existing page, e.g. for the web server
+                shutil.copymode(target_path, tmp_path)
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        log.info(f"Output written to {out_path}")
+    else:
+        # still render, so the log shows how entries are formatted
+        write_html(lambda fragment: None, selected)
+        log.info("No ouput_path set, not writing any output. Edit this script!")
+
+
+def write_html(write, selected):
+    """
+        Renders the whole page and passes it, fragment by fragment, to `write`.
+
+        write : callable taking a string, e.g. the `write` method of a file
+        selected : list of entry dicts for the journal articles, in order
+    """
+    write(page_prefix)
 
-    html += "<h3>Journal Articles</h3>"
+    write("<h3>Journal Articles</h3>")
     # it's nice to have things in a list so they get rendered well when css fails
-    html += '<ul class="pub_list">\n'
-    for key in cite_keys:
-        html += entry_to_html(entries[key])
-    html += "</ul>\n\n"
+    write('<ul class="pub_list">\n')
+    for fragment in render_entries(selected):
+        write(fragment)
+    write("</ul>\n\n")
 
-    html += "<h3>Other</h3>"
-    html += '<ul class="pub_list">\n'
-    for key in other.keys():
-        html += entry_to_html(other[key])
-    html += "</ul>\n\n"
+    write("<h3>Other</h3>")
+    write('<ul class="pub_list">\n')
+    for e in other.values():
+        write(entry_to_html(e))
+    write("</ul>\n\n")
 
-    html += page_suffix
+    write(page_suffix)
 
-    # ------------------------------------------------------------------------------ #
-    # write to file
-    # ------------------------------------------------------------------------------ #
-    if output_path is not None and len(output_path) > 0:
-        with open(output_path, "w") as text_file:
-            text_file.write(html)
-        log.info(f"Output written to {output_path}")
-    else:
-        log.info("No ouput_path set, not writing any output. Edit this script!")
+
+def render_entries(entries):
+    """
+        Converts a list of entry dicts to html strings, see `entry_to_html()`.
+        Yields them in order, as soon as they are ready.
+        For long lists, the work is spread across processes.
+    """
+    if parallel_render_min_entries is None or len(entries) < parallel_render_min_entries:
+        for e in entries:
+            yield entry_to_html(e)
+        return
+
+    # workers may start from a fresh import of this module (the `spawn` and
+    # `forkserver` start methods), so hand over the settings as they are now
+    settings = {name: globals()[name] for name in _RENDER_SETTINGS}
+    with ProcessPoolExecutor(
+        initializer=_init_render_worker, initargs=(settings, log.level)
+    ) as ex:
+        yield from ex.map(entry_to_html, entries, chunksize=4)
+
+
+# module settings that `entry_to_html()` depends on
+_RENDER_SETTINGS = (
+    "show_abstracts",
+    "show_altmetric",
+    "show_arxiv_badge",
+    "use_shieldsio_for_badges",
+    "use_bootstrap_button_for_abstract",
+    "open_badge_links_in_new_tab",
+)
+
+
+def _init_render_worker(settings, log_level):
+    # runs once in every worker process of `render_entries()`
+    globals().update(settings)
+    log.setLevel(log_level)
+
+
+# fixed pieces of markup in `entry_to_html()`, filled with `str.format`
+_TITLE_LINK_TEMPLATE = '<a class="pub_title"\nhref="{url}"\n>\n{title}\n</a>\n'
+_TITLE_TEMPLATE = '<div class="pub_title"\n>\n{title}\n</div>\n'
+_YEAR_TEMPLATE = '<span class="pub_year">\n({year})\n</span>\n'
+_ABSTRACT_BUTTON_TEMPLATE = (
+    '<div class="pub_badge">\n'
+    '<span type="button" class="btn" '
+    'data-toggle="collapse" aria-expanded="false" '
+    'data-target="#abstract_{id}">Toggle abstract</span>'
+    '</div>\n'
+)
+_ABSTRACT_LINK_TEMPLATE = (
+    '<div class="pub_badge">\n'
+    '[<span class="fake_a pub_badge_link" '
+    'data-toggle="collapse" aria-expanded="false" '
+    'data-target="#abstract_{id}">Abstract</span>]\n'
+    '</div>\n'
+)
+_ALTMETRIC_PREFIX = (
+    '<div data-badge-type="2" data-hide-no-mentions="true" class="altmetric-embed" '
+)
+_ABSTRACT_TEMPLATE = (
+    '<div class="collapse" id="abstract_{id}">\n'
+    '<div class="pub_abstract">{abstract}</div>\n'
+    '</div>'
+)
 
 
 # fmt:off
@@ -215,138 +381,125 @@ def entry_to_html(entry):
         Customize as needed to change the style of every list item.
     """
 
-    log.debug(f"Formatting {entry}")
+    # lazy %-formatting, so the entry is only stringified if debug is on
+    log.debug("Formatting %r", entry)
+
+    # look up each field once. missing and empty fields are both falsy
+    eid = entry['ID']
+    author = entry.get('author')
+    title = entry.get('title')
+    url = entry.get('url')
+    journal = entry.get('journal')
+    year = entry.get('year')
+    abstract = entry.get('abstract') if show_abstracts else None
+    arxiv_id = entry.get('arxiv_org_id')
+    badges = entry.get('badges')
 
     # we will print this as info, below.
-    debug_string = f"{entry['ID'] : >30} formatted with:  "
+    tags = []
 
-    # here we collect the final html
-    html = ""
+    # here we collect the pieces of html, joined once at the end
+    parts = []
+    append = parts.append
 
     # make it a list item, since references are usually a list
-    html += "<li>\n"
+    append("<li>\n")
 
     # format authors
-    if 'author' in entry and len(entry['author']) > 0:
-        debug_string += "authors "
-        html += '<div class="pub_author">\n'
-        html += format_authors(entry)
-        # html += ':'
-        html += "\n</div>\n"
+    if author:
+        tags.append("authors")
+        append('<div class="pub_author">\n')
+        append(format_authors(entry))
+        # append(':')
+        append("\n</div>\n")
 
     # format titles as links that lead to the url
-    if 'title' in entry and len(entry['title']) > 0:
-        debug_string += "title "
-        url_is_okay = ('url' in entry and len(entry['url']) > 0)
-        html += f'<{"a" if url_is_okay else "div"} class="pub_title"\n'
-        if url_is_okay:
-            debug_string += "url "
-            html += 'href="' + entry['url'] + '"\n'
-        html += '>\n'
-        # title
-        html += cleanup(entry['title'])
-        # html += ','
-        html += f'\n</{"a" if url_is_okay else "div"}>\n'
+    if title:
+        tags.append("title")
+        if url:
+            tags.append("url")
+            append(_TITLE_LINK_TEMPLATE.format(url = url, title = cleanup(title)))
+        else:
+            append(_TITLE_TEMPLATE.format(title = cleanup(title)))
 
 
     # group all journal details
-    html += '<div class="pub_journal_group">\n'
+    append('<div class="pub_journal_group">\n')
 
     # journal, volume, pages
-    if 'journal' in entry and len(entry['journal']) > 0:
-        debug_string += "journal "
-        html += '<span class="pub_journal">\n'
-        html += entry['journal']
-        if 'volume' in entry and len(entry['volume']) > 0:
-            html += ' ' + entry['volume']
-        if 'pages' in entry and len(entry['pages']) > 0:
-            html += ', ' + entry['pages']
-        html += '\n</span>\n'
+    if journal:
+        tags.append("journal")
+        append('<span class="pub_journal">\n')
+        append(journal)
+        volume = entry.get('volume')
+        if volume:
+            append(' ' + volume)
+        pages = entry.get('pages')
+        if pages:
+            append(', ' + pages)
+        append('\n</span>\n')
 
     # year, only show this if we have a journal and not a preprint
-    if 'year' in entry and len(entry['year']) > 0:
-        debug_string += "year "
-        html += '<span class="pub_year">\n'
-        html += '(' + entry['year'] + ')'
-        html += '\n</span>\n'
+    if year:
+        tags.append("year")
+        append(_YEAR_TEMPLATE.format(year = year))
 
     # close journal group
-    html += '</div>\n'
+    append('</div>\n')
 
     # group badges to avoid weird spacing issues
-    html += '<div class="pub_badge_group">\n'
+    append('<div class="pub_badge_group">\n')
 
     # abstract badge first (toggles whether the abstract is displayed or not)
-    if show_abstracts and 'abstract' in entry and len(entry['abstract']) > 0:
-        debug_string += "abstract "
+    if abstract:
+        tags.append("abstract")
 
         if use_bootstrap_button_for_abstract:
-            html += '<div class="pub_badge">\n'
-            html += '<span type="button" class="btn" '
-            html += 'data-toggle="collapse" aria-expanded="false" '
-            html += 'data-target="#abstract_' + entry['ID'] + '">'
-            html += "Toggle abstract"
-            html += '</span>'
-            html += '</div>\n'
-
+            append(_ABSTRACT_BUTTON_TEMPLATE.format(id = eid))
         else:
-            html += '<div class="pub_badge">\n'
-            html += '['
-            html += '<span class="fake_a pub_badge_link" '
-            html += 'data-toggle="collapse" aria-expanded="false" '
-            html += 'data-target="#abstract_' + entry['ID'] + '">'
-            html += "Abstract"
-            html += '</span>'
-            html += ']\n'
-            html += '</div>\n'
+            append(_ABSTRACT_LINK_TEMPLATE.format(id = eid))
 
 
     # arxiv badge
-    if show_arxiv_badge and "arxiv_org_id" in entry:
-        html += format_badge(
+    if show_arxiv_badge and arxiv_id is not None:
+        append(format_badge(
             desc = "arXiv",
-            url = "https://arxiv.org/abs/" + entry["arxiv_org_id"],
-        )
-        debug_string += f"badge(arXiv) "
+            url = "https://arxiv.org/abs/" + arxiv_id,
+        ))
+        tags.append("badge(arXiv)")
 
     # other badges
-    if 'badges' in entry and len(entry['badges']) > 0:
-        for b in entry['badges']:
+    if badges:
+        for b in badges:
             assert 'url' in b and 'desc' in b
-            html += format_badge(**b)
-            debug_string += f"badge({list(b.values())[0]}) "
+            append(format_badge(**b))
+            tags.append(f"badge({b['desc']})")
 
     # altmetric badge
-    if show_altmetric and ("arxiv_org_id" in entry or "doi" in entry):
-        html += '<div data-badge-type="2" '
-        html += 'data-hide-no-mentions="true" '
-        html += 'class="altmetric-embed" '
+    if show_altmetric and (arxiv_id is not None or "doi" in entry):
+        append(_ALTMETRIC_PREFIX)
         # I prefer arxiv id over doi
-        if "arxiv_org_id" in entry:
-            html += f'data-arxiv-id="{entry["arxiv_org_id"]}"'
+        if arxiv_id is not None:
+            append(f'data-arxiv-id="{arxiv_id}"')
         else:
-            html += f'data-doi="{entry["doi"]}"'
+            append(f'data-doi="{entry["doi"]}"')
         if open_badge_links_in_new_tab:
-            html += ' data-link-target="_blank"'
-        html += ' ></div>\n'
-        debug_string += f"badge(altmetric) "
+            append(' data-link-target="_blank"')
+        append(' ></div>\n')
+        tags.append("badge(altmetric)")
 
      # close badge group
-    html += '</div>\n'
+    append('</div>\n')
 
     # abstract div
-    if show_abstracts and 'abstract' in entry and len(entry['abstract']) > 0:
-        html += '<div class="collapse" id="abstract_' + entry['ID'] + '">\n'
-        html += '<div class="pub_abstract">'
-        html += cleanup(entry['abstract'])
-        html += '</div>\n'
-        html += '</div>'
+    if abstract:
+        append(_ABSTRACT_TEMPLATE.format(id = eid, abstract = cleanup(abstract)))
 
-    html += '</li>\n\n' # list item
+    append('</li>\n\n') # list item
 
-    log.info(debug_string)
+    log.info("%30s formatted with:  %s", eid, " ".join(tags))
 
-    return html
+    return "".join(parts)
 # fmt:on
 
 
@@ -355,6 +508,12 @@ def entry_to_html(entry):
 # ------------------------------------------------------------------------------ #
 
 
+@functools.lru_cache(maxsize=4096)
+def _latex_to_text(raw):
+    # the converter keeps no state between calls, so results can be reused
+    return _L2T.latex_to_text(raw)
+
+
 def cleanup(raw):
     """
         helper to clean up text that comes from bibtex and does not work well
@@ -362,35 +521,145 @@ def cleanup(raw):
     """
     # bibtex escapes stuff, which breaks parsing
 
-    res = LatexNodes2Text().latex_to_text(raw)
+    # most text is plain, only run the (slow) latex parser when needed
+    if _LATEX_RE.search(raw) is None:
+        res = raw
+    else:
+        res = _latex_to_text(raw)
     # res = res.replace("<p>", "")
     # res = res.replace("</p>", "")
-    # I use double quotes for attributes. hence, only use single quotes in text
-    res = res.replace('"', "'")
-    # escape quotes, see https://pagedart.com/blog/single-quote-in-html/
-    # res = res.replace('"', '&#34;')
-    # res = res.replace("'", '&#39;')
-    # res = res.replace('&', '&amp;')
-    # res = res.replace('<', '&lt;')
-    # res = res.replace('>', '&gt;')
+    # single pass for all character replacements, see `_CLEANUP_TABLE`
+    res = res.translate(_CLEANUP_TABLE)
     return res
 
 
+def load_bibtex(path, only_keys=None):
+    """
+        Parse the bibtex file at `path` into a bibtex database.
+
+        path : string, location of the .bib file
+        only_keys : list of strings, optional. if given, the raw text is
+            prefiltered so that only these entries (and `@string` / `@preamble`
+            definitions) are handed to the parser. Parsing is the slow part,
+            so this saves a lot of time for large libraries. If a selected
+            key does not turn up this way, the full file is parsed instead.
+            Note: entries that are only referenced via `crossref` are dropped.
+
+        If `cache_parsed_bibtex` is set, the parsed entries are stored as json in
+        `<path>.cache.json` and reused as long as the .bib file is unchanged.
+    """
+
+    # the cache is only valid for the same file version and the same selection
+    stat = os.stat(path)
+    header = {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "keys": None if only_keys is None else list(only_keys),
+    }
+    cache_path = path + ".cache.json"
+
+    if cache_parsed_bibtex and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as cache_file:
+                cached = _json_loads(cache_file.read())
+            if cached["header"] == header:
+                log.info(f"Using cached entries from '{cache_path}'")
+                db = BibDatabase()
+                db.entries = cached["entries"]
+                return db
+        except Exception as e:
+            log.warning(f"Could not read cache '{cache_path}': {e}")
+
+    # read everything in one go with a large buffer, parsing works on the string
+    with open(path, "rb", buffering=_IO_BUFFER_SIZE) as bibtex_file:
+        text = bibtex_file.read().decode("utf-8")
+
+    if only_keys is None:
+        db = _parse_bibtex(text)
+    else:
+        db = _parse_bibtex(_prefilter_bibtex(text, only_keys))
+        # the prefilter is a heuristic (e.g. it misses two entries on one line,
+        # or cuts entries at a line starting with `@word{` inside a field).
+        # if anything is missing, parse everything so we never cache less
+        # than the full parser would find.
+        found = {e.get("ID") for e in db.entries}
+        missing = [k for k in only_keys if k not in found]
+        if len(missing) > 0:
+            log.warning(
+                f"Prefiltering '{path}' missed {missing}, parsing the full file"
+            )
+            db = _parse_bibtex(text)
+
+    if cache_parsed_bibtex:
+        try:
+            # write aside and swap in, so an interrupted or concurrent run
+            # never leaves a truncated cache behind
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as cache_file:
+                cache_file.write(_json_dumps({"header": header, "entries": db.entries}))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            log.warning(f"Could not write cache '{cache_path}': {e}")
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+
+    return db
+
+
+def _parse_bibtex(text):
+    parser = BibTexParser(common_strings=True)
+    # do not skip non-standard bibtex fields
+    parser.ignore_nonstandard_types = False
+    return bibtexparser.loads(text, parser=parser)
+
+
+def _json_loads(data):
+    # data : bytes
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def _json_dumps(obj):
+    # returns bytes
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _prefilter_bibtex(text, keys):
+    """
+        Slice out the raw text of entries whose citekey is in `keys`, keeping
+        all `@string` and `@preamble` blocks so macros still resolve.
+    """
+    keys = set(keys)
+    matches = list(_BIBTEX_ENTRY_RE.finditer(text))
+    blocks = []
+    for mdx, m in enumerate(matches):
+        kind = m.group(1).lower()
+        if kind == "comment":
+            continue
+        if kind not in ("string", "preamble") and m.group(2) not in keys:
+            continue
+        end = matches[mdx + 1].start() if mdx + 1 < len(matches) else len(text)
+        blocks.append(text[m.start() : end])
+    return "\n".join(blocks)
+
+
 def get_entry_for_citekey(db, key):
     """
         db : bibtex database
-        key : string, the citekey to look for, or list of strings
+        key : string, the citekey to look for, or list/tuple of strings
     """
 
-    if isinstance(key, list):
+    if isinstance(key, (list, tuple)):
         keys = key
     else:
         keys = [key]
 
-    entries = dict()
-    for e in db.entries:
-        if "ID" in e and e["ID"] in keys:
-           entries[e["ID"]] = e
+    # index once, then look up. avoids scanning all entries for every key
+    by_id = {e["ID"]: e for e in db.entries if "ID" in e}
+    entries = {k: by_id[k] for k in keys if k in by_id}
 
     for e in entries.values():
         find_arxiv_id_in_entry(e, add_to_entry=True)
@@ -412,24 +681,18 @@ def find_arxiv_id_in_entry(entry, add_to_entry = True):
     """
 
     arxiv_id = None
-    while arxiv_id is None:
-        if "eprint" in entry.keys() and "eprinttype" in entry.keys():
-            # this is the default from BetterBibTex
-            if entry["eprinttype"].lower() == "arxiv":
-                arxiv_id = entry["eprint"]
-                break
-
-        if "doi" in entry.keys():
+    if "eprint" in entry and entry.get("eprinttype", "").lower() == "arxiv":
+        # this is the default from BetterBibTex
+        arxiv_id = entry["eprint"]
+    else:
+        # avoid bioarxiv
+        # https://www.biorxiv.org/content/early/2018/04/11/299859
+        m = _ARXIV_URL_RE.search(entry.get("url", ""))
+        if m is None:
             # as of 2022 arxiv preprints get DOIs as `arXiv.2201.NNNNN`
-            if "arXiv." in entry["doi"]:
-                arxiv_id = entry["doi"].split("arXiv.", 1)[1]
-
-        if "url" in entry.keys() and "arxiv.org/abs/" in entry["url"]:
-            # avoid bioarxiv
-            # https://www.biorxiv.org/content/early/2018/04/11/299859
-            arxiv_id = entry["url"].split("arxiv.org/abs/", 1)[1]
-            break
-        break
+            m = _ARXIV_DOI_RE.search(entry.get("doi", ""))
+        if m is not None:
+            arxiv_id = m.group(1)
 
     if add_to_entry and arxiv_id is not None:
         entry["arxiv_org_id"] = arxiv_id
@@ -448,106 +711,174 @@ def get_entries_for_author(db, author_strings):
         db : bibtex database
         author_strings : list of strings to search for in the authors field
     """
+    # lowercase the queries once, not for every entry
+    queries = [s.lower() for s in author_strings]
     res = []
     for e in db.entries:
         if "author" not in e:
             continue
-        for s in author_strings:
-            if s.lower() in e["author"].lower():
+        author = e["author"].lower()
+        for s in queries:
+            if s in author:
                 res.append(e)
                 break
     return res
 
 
+# our default shields for arxiv and github, same as what `shieldio()` would give
+_SHIELDIO_ARXIV_TEMPLATE = "https://img.shields.io/badge/arXiv-{id}-b31b1b"
+_SHIELDIO_GITHUB_URL = "https://img.shields.io/badge/-GitHub-066da5?logo=github"
+
+
+def _format_badge_shieldsio(**kwargs):
+    # badge as a shields.io image, see `format_badge()`
+    parts = []
+    append = parts.append
+    append('<span class="pub_badge">\n')
+    append('<a class="pub_badge_link"')
+    append('href="' + kwargs['url'] + '"')
+    if open_badge_links_in_new_tab:
+        append(' target="_blank"')
+    append('><img src="')
+
+    # prepate shildio badges
+    if len(kwargs) == 2 and 'desc' in kwargs and 'url' in kwargs:
+        # default case, use our own defaults
+        desc = kwargs['desc'].lower()
+        if desc == 'arxiv':
+            # this is a bit back and forth, but keeps it in one place
+            arxiv_id = kwargs['url'].replace("https://arxiv.org/abs/", "")
+            append(_SHIELDIO_ARXIV_TEMPLATE.format(id=arxiv_id))
+        elif desc == 'github':
+            append(_SHIELDIO_GITHUB_URL)
+    else:
+        # pass what we got, desc and url are not part of the shield
+        append(shieldio(**{
+            k: v for k, v in kwargs.items() if k not in ('desc', 'url')
+        }))
+
+    append('"></img>')
+    append('</a>')
+    append('\n</span>\n')
+    return "".join(parts)
+
+
+def _format_badge_plain(**kwargs):
+    # badge as a plain text link, see `format_badge()`
+    parts = []
+    append = parts.append
+    append('<span class="pub_badge">\n')
+    append('[')
+    append('<a class="pub_badge_link"')
+    append('href="' + kwargs['url'] + '"')
+    if open_badge_links_in_new_tab:
+        append(' target="_blank"')
+    append('>')
+    append(kwargs['desc'])
+    append('</a>')
+    append(']')
+    append('\n</span>\n')
+    return "".join(parts)
+
+
 def format_badge(**kwargs):
 # badges for arxiv and the likes, pass at least 'desc' and 'url'
     if use_shieldsio_for_badges:
-        badge = '<span class="pub_badge">\n'
-        badge += '<a class="pub_badge_link"'
-        badge += 'href="' + kwargs['url'] + '"'
-        if open_badge_links_in_new_tab:
-            badge += ' target="_blank"'
-        badge += '><img src="'
-
-        # prepate shildio badges
-        if len(kwargs) == 2 and 'desc' in kwargs and 'url' in kwargs:
-            # default case, use our own defaults
-            if 'arxiv' == kwargs['desc'].lower():
-                # this is a bit back and forth, but keeps it in one place
-                arxiv_id = kwargs['url'].replace("https://arxiv.org/abs/", "")
-                badge += shieldio(left='arXiv', right=arxiv_id, color='b31b1b')
-            elif 'github' == kwargs['desc'].lower():
-                badge += shieldio(left='', right='GitHub', color='066da5', logo='github')
-        else:
-            # pass what we got
-            badge += shieldio(**kwargs)
+        return _format_badge_shieldsio(**kwargs)
+    return _format_badge_plain(**kwargs)
 
-        badge += '"></img>'
-        badge += '</a>'
-        badge += '\n</span>\n'
-    else:
-        badge = '<span class="pub_badge">\n'
-        badge += '['
-        badge += '<a class="pub_badge_link"'
-        badge += 'href="' + kwargs['url'] + '"'
-        if open_badge_links_in_new_tab:
-            badge += ' target="_blank"'
-        badge += '>'
-        badge += kwargs['desc']
-        badge += '</a>'
-        badge += ']'
-        badge += '\n</span>\n'
-    return badge
 
 def shieldio(left, right, color=None, logo=None, logoColor=None):
     # format url to get the shield.io image
-    url = "https://img.shields.io/badge/"
-    url += left + "-" + right
+    parts = ["https://img.shields.io/badge/", left, "-", right]
     if color is not None:
-        url += "-" + color
+        parts.append("-" + color)
     if logo is not None:
-        url += "?logo=" + logo
+        parts.append("?logo=" + logo)
         if logoColor is not None:
-            url += "&logoColor=" + logoColor
-    return url
+            parts.append("&logoColor=" + logoColor)
+    return "".join(parts)
+
+# formatted author strings, see `format_authors()`
+_AUTHOR_CACHE = dict()
+
+
+@functools.lru_cache(maxsize=None)
+def _splitname(name):
+    # the same authors appear across many entries, only split each name once.
+    # callers must not modify the returned dict, it is shared.
+    return btxc.splitname(name)
+
+
+def _split_author_field(author):
+    # Split author field into a list of “Name, Surname”. seems to be inplace,
+    # thats why we use a minimal dict instead of the entry (or a copy of it)
+    r = {"author": author}
+    btxc.author(r)
+    return [_splitname(name) for name in r["author"]]
+
+
+def split_authors(entries):
+    """
+        Parses the author field of every entry once and stores the split names
+        as `_authors_split`, where `format_authors()` picks them up.
+        Call this after customizing the author field, if at all.
+
+        entries : list of entry dicts
+    """
+    for e in entries:
+        if "author" in e:
+            e["_authors_split"] = _split_author_field(e["author"])
+
 
 def format_authors(entry, abbreviate_first=True, et_al_at=1000):
     """
         this is the way i like it, tweak as needed.
+        results are cached, so every entry is only formatted once per run.
     """
 
-    # Split author field into a list of “Name, Surname”. seems to be inplace,
-    # thats why we copy first
-    r = entry.copy()
-    btxc.author(r)
-    names = r["author"]
+    cache_key = (entry["ID"], entry["author"], abbreviate_first, et_al_at)
+    if cache_key in _AUTHOR_CACHE:
+        return _AUTHOR_CACHE[cache_key]
+
+    # names might have been split already, see `split_authors()`
+    splits = entry.get("_authors_split")
+    if splits is None:
+        splits = _split_author_field(entry["author"])
+
+    # with too many authors we only show the first one, no need to format the rest
+    et_al = len(splits) > et_al_at
+    if et_al:
+        splits = splits[:1]
     authors = []
 
-    for name in names:
+    for split in splits:
         # {'first': ['F.', 'Paul'], 'last': ['Spitzner'], 'von': [], 'jr': []}
-        split = btxc.splitname(name)
         # log.info(split)
+        # fix capitalization of first names here. initials only need upper case,
+        # title case is kept for full names as it handles e.g. "Jean-Paul"
         if not abbreviate_first:
-            first = " ".join(split["first"])
+            first = " ".join(split["first"]).title()
         else:
-            first = ""
+            initials = []
             for f in split["first"]:
                 # name spelled out
                 if len(f) > 2:
-                    first += f[0] + "."
+                    initials.append(f[0].upper() + ".")
                 elif f[1] in ".:;":
-                    first += f[0] + "."
+                    initials.append(f[0].upper() + ".")
                 else:
                     log.info(
-                        f"Adapt the `format_authors` script to your needs for entry {r['ID']}"
+                        f"Adapt the `format_authors` script to your needs for entry {entry['ID']}"
                     )
+            first = "".join(initials)
 
         last = " ".join(split["last"])
         von = " ".join(split["von"])
         jr = " ".join(split["jr"])
 
         # stitch the name together and fix capitalziation
-        temp = first.title()
+        temp = first
         if len(von) > 0:
             temp += " " + von.lower()
         temp += " " + last  # do not title case this, breaks e.g. "de Heuvel"
@@ -561,22 +892,25 @@ def format_authors(entry, abbreviate_first=True, et_al_at=1000):
     # one-liner for the webiste.
     # why the spans? we do not want to break white spaces after the initals
     # and do this via some css. (white-space:nowrap;)
-    if len(authors) > et_al_at:
+    if et_al:
         res = "<span>" + authors[0] + " et al." + "</span>"
     elif len(authors) == 1:
         res = "<span>" + authors[0] + "</span>"
     else:
-        for adx, a in enumerate(authors):
-            authors[adx] = "<span>" + a + "</span>"
-        res = authors[0]
-        for a in authors[1:-1]:
-            res += ", " + a
-        res += " and " + authors[-1]
+        # one join for all but the last author, no per-author temporaries
+        res = (
+            "<span>"
+            + "</span>, <span>".join(authors[:-1])
+            + "</span> and <span>"
+            + authors[-1]
+            + "</span>"
+        )
 
     # cleanup bibtex brackets
     res = cleanup(res)
     # res = res.replace("{", "")
     # res = res.replace("}", "")
+    _AUTHOR_CACHE[cache_key] = res
     return res
 
 